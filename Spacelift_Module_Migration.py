@@ -1,19 +1,52 @@
 import os
+import argparse
+import cProfile
+import functools
+import hashlib
+import tracemalloc
 import requests
 import subprocess
 import json
 import base64
 import keyring
-from git import Repo
+from git import Repo, Git
 from typing import List, Dict, Any, Optional
 import time
 import shutil
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from terraform_index import index_terraform_files
+
+def profiled_phase(phase: str):
+    """Run a migration phase under cProfile and tracemalloc when profiling is enabled"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            # Disabled (or already inside a profiled phase): call straight through
+            if not self.profile_dir or self.active_phase:
+                return func(self, *args, **kwargs)
+            return self.run_profiled_phase(phase, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+SCHEDULE_POLICIES = ["listing", "largest-first", "smallest-first", "round-robin"]
+
+def parse_shard(value: str) -> (int, int):
+    """Parse a 1-based 'i/N' shard specification"""
+    match = re.match(r'^(\d+)/(\d+)$', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Shard must be in the form i/N, got: {value}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 1 and N, got: {value}")
+    return index, count
 
 class InteractiveMigration:
-    def __init__(self):
+    def __init__(self, profile_dir: Optional[str] = None, schedule_policy: str = "listing",
+                 shard: Optional[tuple] = None):
         self.azure_org = None
         self.azure_project = None
         self.spacelift_org = None
@@ -23,6 +56,44 @@ class InteractiveMigration:
         self.service_id = "azure_devops_migration"
         self.username = "default"
         self.bearer_token = None  # Initialize token as None
+        self.preflight_data = None
+        
+        # Opt-in profiling of migration phases
+        self.profile_dir = profile_dir
+        self.profile_top_allocations = 15
+        self.active_phase = None
+        self.phase_profiles = {}
+        
+        # Repository scheduling by expected cost (size + tag count from prior runs)
+        self.schedule_policy = schedule_policy
+        self.tag_cost_bytes = 1024 * 1024  # Each version costs roughly as much as 1 MiB of clone
+        self.schedule_buckets = 4  # Size buckets interleaved by the round-robin policy
+        
+        # Sharding across worker machines; every shard gets its own output files
+        self.shard = shard
+        shard_suffix = f".shard-{shard[0]}-of-{shard[1]}" if shard else ""
+        if shard:
+            self.temp_dir = os.path.join(self.temp_dir, f"shard-{shard[0]}-of-{shard[1]}")
+        self.log_file = f"migration_log{shard_suffix}.txt"
+        self.journal_file = f"migration_journal{shard_suffix}.jsonl"
+        self.metrics_file = f"migration_metrics{shard_suffix}.json"
+        self.report_file = "migration_report.json"
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.metrics = {"status_counts": {}, "repo_seconds": {}}
+        
+        # Per-repo analysis cache keyed by ref state (HEAD SHA + hash of tag refs)
+        self.analysis_cache_file = 'analysis_cache.json'
+        self.analysis_cache_max_age = timedelta(days=30)
+        self.analysis_cache = None
+        self.repo_analysis = {}  # local_path -> cache entry for repositories in this run
+        
+        # Bulk rollback tuning
+        self.rollback_batch_size = 20
+        self.rollback_workers = 4
+        self.rollback_requests_per_second = 2.0
+        self.rollback_retries = 3
+        self._rate_lock = threading.Lock()
+        self._last_request_at = 0.0
         
         # Global module options with defaults
         self.global_options = {
@@ -34,6 +105,8 @@ class InteractiveMigration:
             "projectRoot": "",
             "labels": []
         }
+        # Per-module options, collected once per module before cloning
+        self.module_options = {}
 
     # Helper function to post GraphQL queries
     def graphql_post(self, query: str, variables: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -48,6 +121,62 @@ class InteractiveMigration:
         else:
             raise Exception(f"GraphQL request failed with status {response.status_code}")
 
+    def run_profiled_phase(self, phase: str, func, *args, **kwargs):
+        """Profile a phase call, accumulating into that phase's profile and allocation summary"""
+        profile = self.phase_profiles.setdefault(phase, {
+            "profiler": cProfile.Profile(),
+            "calls": 0,
+            "elapsed": 0.0,
+            "peak": 0,
+            "allocations": {}  # "file:line" -> [size diff, count diff] summed over calls
+        })
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        before = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+        start = time.perf_counter()
+        self.active_phase = phase
+        try:
+            return profile["profiler"].runcall(func, self, *args, **kwargs)
+        finally:
+            self.active_phase = None
+            profile["calls"] += 1
+            profile["elapsed"] += time.perf_counter() - start
+            after = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            profile["peak"] = max(profile["peak"], peak)
+            for stat in after.compare_to(before, 'lineno'):
+                frame = stat.traceback[0]
+                site = profile["allocations"].setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+                site[0] += stat.size_diff
+                site[1] += stat.count_diff
+
+    def write_profiles(self) -> None:
+        """Write one <phase>.pstats and <phase>.alloc.txt per profiled phase"""
+        if not self.profile_dir or not self.phase_profiles:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for phase, profile in self.phase_profiles.items():
+            stats_path = os.path.join(self.profile_dir, f"{phase}.pstats")
+            profile["profiler"].dump_stats(stats_path)
+
+            top_sites = sorted(profile["allocations"].items(), key=lambda item: item[1][0], reverse=True)
+            top_sites = top_sites[:self.profile_top_allocations]
+            with open(os.path.join(self.profile_dir, f"{phase}.alloc.txt"), 'w') as f:
+                f.write(f"Phase: {phase}\n")
+                f.write(f"Calls: {profile['calls']}\n")
+                f.write(f"Elapsed: {profile['elapsed']:.3f}s total, {profile['elapsed'] / profile['calls']:.3f}s per call\n")
+                f.write(f"Peak traced memory (largest call): {profile['peak'] / 1024:.1f} KiB\n\n")
+                f.write(f"Top {len(top_sites)} allocation sites (net size over all calls):\n")
+                for site, (size_diff, count_diff) in top_sites:
+                    f.write(f"{site}: {size_diff / 1024:+.1f} KiB, {count_diff:+d} blocks\n")
+
+            print(f"📊 Profiled {phase}: {profile['calls']} calls, {profile['elapsed']:.2f}s -> {stats_path}")
+
     def get_spacectl_token(self) -> bool:
         print("\n🔐 Authenticating with Spacelift...")
         try:
@@ -94,9 +223,153 @@ class InteractiveMigration:
         self.migration_log.append(f"{timestamp}: {message}")
 
     def save_migration_log(self) -> None:
-        with open('migration_log.txt', 'w') as f:
+        with open(self.log_file, 'w') as f:
             f.write('\n'.join(self.migration_log))
 
+    def record_journal(self, event: str, journal_file: Optional[str] = None, **fields) -> None:
+        """Append a structured event to this run's journal (one JSON object per line)"""
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "run_id": self.run_id,
+            "shard": f"{self.shard[0]}/{self.shard[1]}" if self.shard else None,
+            "event": event
+        }
+        entry.update(fields)
+        with open(journal_file or self.journal_file, 'a') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+    def finish_repo(self, repo: dict, status: str, started: float) -> None:
+        elapsed = round(time.perf_counter() - started, 3)
+        self.metrics["status_counts"][status] = self.metrics["status_counts"].get(status, 0) + 1
+        self.metrics["repo_seconds"][repo["name"]] = elapsed
+        self.record_journal("repo", repo=repo["name"], repo_id=repo.get("id"), status=status, seconds=elapsed)
+        # Persist after every repository so an interrupted run keeps what it learned
+        if self.analysis_cache is not None:
+            self.save_analysis_cache()
+
+    def save_metrics(self, started_at: datetime) -> None:
+        finished_at = datetime.now()
+        metrics = {
+            "run_id": self.run_id,
+            "shard": f"{self.shard[0]}/{self.shard[1]}" if self.shard else None,
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "finished_at": finished_at.isoformat(timespec="seconds"),
+            "duration_seconds": round((finished_at - started_at).total_seconds(), 3),
+            "status_counts": self.metrics["status_counts"],
+            "repo_seconds": self.metrics["repo_seconds"]
+        }
+        with open(self.metrics_file, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+    def shard_repositories(self, repos: List[dict]) -> List[dict]:
+        """Keep only the repositories that belong to this shard (stable hash of the repo id)"""
+        if not self.shard:
+            return repos
+        index, count = self.shard
+        shard_repos = [
+            repo for repo in repos
+            if int(hashlib.sha256(repo["id"].encode()).hexdigest(), 16) % count == index - 1
+        ]
+        print(f"\n🧩 Shard {index}/{count}: {len(shard_repos)} of {len(repos)} repositories")
+        self.log_migration(f"Shard {index}/{count}: {len(shard_repos)} of {len(repos)} repositories")
+        return shard_repos
+
+    def merge_shard_journals(self, journal_paths: List[str]) -> Dict[str, Any]:
+        """Combine the journals of several shard runs into a single report"""
+        print(f"\n🧩 Merging {len(journal_paths)} shard journals...")
+        journals = {}
+        for path in journal_paths:
+            with open(path, 'r') as f:
+                journals[path] = [json.loads(line) for line in f if line.strip()]
+        # Modules removed by --rollback are no longer part of the migration
+        deleted = {entry["module_id"] for entries in journals.values() for entry in entries
+                   if entry["event"] == "module_deleted"}
+
+        repos = {}
+        modules_created = []
+        shards = {}
+        for path, entries in journals.items():
+            # Journals are appended to across runs; only the latest run of each shard counts
+            run_entries = [entry for entry in entries if entry["event"] in ("repo", "module_created")]
+            latest_run = max((entry["run_id"] for entry in run_entries), default=None)
+            for entry in run_entries:
+                if entry["run_id"] != latest_run:
+                    continue
+                shard = entry.get("shard") or path
+                shard_info = shards.setdefault(shard, {"journal": path, "run_id": latest_run,
+                                                       "first_event": entry["timestamp"], "last_event": entry["timestamp"]})
+                shard_info["first_event"] = min(shard_info["first_event"], entry["timestamp"])
+                shard_info["last_event"] = max(shard_info["last_event"], entry["timestamp"])
+                if entry["event"] == "repo":
+                    repos.setdefault(entry["repo_id"] or entry["repo"], []).append(entry)
+                elif entry["module_id"] not in deleted:
+                    modules_created.append(entry)
+
+        status_counts = {}
+        overlapping = []
+        for repo_id, entries in repos.items():
+            latest = max(entries, key=lambda entry: entry["timestamp"])
+            status_counts[latest["status"]] = status_counts.get(latest["status"], 0) + 1
+            if len({entry.get("shard") for entry in entries}) > 1:
+                overlapping.append(latest["repo"])
+
+        report = {
+            "shards": shards,
+            "repositories": len(repos),
+            "status_counts": status_counts,
+            "modules_created": [
+                {"repo": entry["repo"], "module_id": entry.get("module_id"), "space": entry.get("space"), "shard": entry.get("shard")}
+                for entry in modules_created
+            ],
+            "repo_seconds_total": round(sum(entry["seconds"] for entries in repos.values() for entry in entries), 3),
+            "overlapping_repositories": overlapping
+        }
+        with open(self.report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"✅ {len(repos)} repositories across {len(shards)} shards")
+        for status, count in sorted(status_counts.items()):
+            print(f"  - {status}: {count}")
+        if overlapping:
+            print(f"⚠️ {len(overlapping)} repositories were processed by more than one shard: {', '.join(overlapping)}")
+        print(f"📝 Report saved to {self.report_file}")
+        return report
+
+    def estimate_repo_cost(self, repo: dict, analysis_cache: Dict[str, Any]) -> int:
+        """Repository size plus the versions found for it in earlier runs' analysis"""
+        versions = analysis_cache.get(repo.get("id"), {}).get("versions", {})
+        return repo.get("size", 0) + len(versions.get("tags", [])) * self.tag_cost_bytes
+
+    def order_repositories(self, repos: List[dict]) -> List[dict]:
+        """Order repositories according to the selected scheduling policy"""
+        if self.schedule_policy == "listing" or len(repos) < 2:
+            return repos
+
+        costs = self.load_analysis_cache()
+        by_cost = sorted(repos, key=lambda repo: self.estimate_repo_cost(repo, costs), reverse=True)
+
+        if self.schedule_policy == "largest-first":
+            ordered = by_cost
+        elif self.schedule_policy == "smallest-first":
+            ordered = list(reversed(by_cost))
+        elif self.schedule_policy == "round-robin":
+            # Repositories are listed from a single project, so interleave size buckets
+            # instead: large and small repositories alternate, smoothing clone and API load
+            bucket_count = min(self.schedule_buckets, len(by_cost))
+            queues = [by_cost[i * len(by_cost) // bucket_count:(i + 1) * len(by_cost) // bucket_count]
+                      for i in range(bucket_count)]
+            ordered = []
+            while queues:
+                ordered.extend(queue.pop(0) for queue in queues)
+                queues = [queue for queue in queues if queue]
+        else:
+            raise ValueError(f"Unknown schedule policy: {self.schedule_policy}")
+
+        print(f"\n📊 Scheduling {len(ordered)} repositories ({self.schedule_policy}):")
+        for repo in ordered:
+            print(f"- {repo['name']} (estimated cost: {self.estimate_repo_cost(repo, costs) / 1024:.0f} KiB)")
+        return ordered
+
     def get_user_input(self) -> bool:
         print("\n🔷 Configuration Setup")
         saved_config = self.load_config()
@@ -156,6 +429,7 @@ class InteractiveMigration:
         os.environ["AZURE_DEVOPS_PAT"] = azure_pat
         return True
 
+    @profiled_phase("get_azure_repos")
     def get_azure_repos(self) -> List[dict]:
         print("\n🔍 Fetching repositories from Azure DevOps...")
         pat = os.getenv("AZURE_DEVOPS_PAT")
@@ -179,17 +453,77 @@ class InteractiveMigration:
                 return self.get_azure_repos()
             return []
 
-    def clone_repo(self, repo_url: str, local_path: str, repo_name: str):
-        print(f"\n📥 Cloning repository: {repo_name}")
-        
+    def get_auth_url(self, repo_name: str) -> str:
         # Handle spaces in paths and URLs
         pat = os.getenv("AZURE_DEVOPS_PAT")  # Changed from AZURE_PAT_ENV
         encoded_project = self.azure_project.replace(" ", "%20")
         encoded_repo = repo_name.replace(" ", "%20")
-        auth_url = f"https://{pat}@dev.azure.com/{self.azure_org}/{encoded_project}/_git/{encoded_repo}"
+        return f"https://{pat}@dev.azure.com/{self.azure_org}/{encoded_project}/_git/{encoded_repo}"
+
+    def get_remote_ref_key(self, repo_name: str) -> Optional[str]:
+        """Fingerprint the remote ref state (HEAD SHA + hash of tag refs) without cloning"""
+        try:
+            output = Git().ls_remote(self.get_auth_url(repo_name), "HEAD", "refs/tags/*",
+                                     env={"GIT_TERMINAL_PROMPT": "0"})
+        except Exception as e:
+            print(f"⚠️ Could not list remote refs for {repo_name}: {e}")
+            return None
+        head_sha = None
+        tag_refs = []
+        for line in output.splitlines():
+            sha, ref = line.split("\t", 1)
+            if ref == "HEAD":
+                head_sha = sha
+            else:
+                tag_refs.append(f"{sha} {ref}")
+        if not head_sha:
+            return None
+        tags_hash = hashlib.sha256("\n".join(sorted(tag_refs)).encode()).hexdigest()[:16]
+        return f"{head_sha}-{tags_hash}"
+
+    def load_analysis_cache(self) -> Dict[str, Any]:
+        """Load the analysis cache, evicting entries older than the maximum age"""
+        if self.analysis_cache is None:
+            try:
+                with open(self.analysis_cache_file, 'r') as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+            cutoff = datetime.now() - self.analysis_cache_max_age
+            self.analysis_cache = {
+                repo_id: entry for repo_id, entry in cache.items()
+                if datetime.fromisoformat(entry["stored_at"]) >= cutoff
+            }
+            evicted = len(cache) - len(self.analysis_cache)
+            if evicted:
+                print(f"🧹 Evicted {evicted} stale analysis cache entries")
+        return self.analysis_cache
+
+    def save_analysis_cache(self) -> None:
+        with open(self.analysis_cache_file, 'w') as f:
+            json.dump(self.load_analysis_cache(), f, indent=2)
+
+    def get_repo_analysis(self, repo: dict, local_path: str, ref_key: Optional[str]) -> Dict[str, Any]:
+        """Return the cached analysis for a repository if its refs are unchanged, else a fresh entry"""
+        cache = self.load_analysis_cache()
+        entry = cache.get(repo["id"])
+        if not ref_key or not entry or entry.get("ref_key") != ref_key:
+            # Refs changed (or unknown): replace the stale entry
+            entry = {"repo": repo["name"], "ref_key": ref_key, "terraform": {}}
+        entry["stored_at"] = datetime.now().isoformat(timespec="seconds")
+        if ref_key:
+            cache[repo["id"]] = entry
+        self.repo_analysis[local_path] = entry
+        return entry
+
+    @profiled_phase("clone_repo")
+    def clone_repo(self, repo_url: str, local_path: str, repo_name: str):
+        print(f"\n📥 Cloning repository: {repo_name}")
+        
+        auth_url = self.get_auth_url(repo_name)
         
         # Create safe local path
-        safe_local_path = os.path.join(self.temp_dir, repo_name.replace(" ", "_"))  # Changed from self.TEMP_DIR
+        safe_local_path = self.get_clone_path(repo_name)
         
         # Check if directory exists using safe_local_path
         if os.path.exists(safe_local_path):
@@ -202,16 +536,41 @@ class InteractiveMigration:
                 self.log_migration(f"Skipped existing repository: {repo_name}")
                 return
         
+        # Partial clone without checkout: history and trees only. Files are listed
+        # with ls-tree and only the project root is checked out (checkout_project_root)
         Repo.clone_from(
             auth_url,
             safe_local_path,
-            env={"GIT_TERMINAL_PROMPT": "0"}
+            env={"GIT_TERMINAL_PROMPT": "0"},
+            multi_options=["--filter=blob:none", "--no-checkout"]
         )
         print(f"✅ Successfully cloned {repo_name}")
         self.log_migration(f"Cloned repository: {repo_name}")
 
+    def get_clone_path(self, repo_name: str) -> str:
+        return os.path.join(self.temp_dir, repo_name.replace(" ", "_"))
+
+    def checkout_project_root(self, local_path: str, project_root: str) -> None:
+        """Check out only the project root of a partial clone (cone mode also keeps top-level files)"""
+        repo = Repo(local_path)
+        print(f"📂 Sparse checkout limited to: {project_root or 'top-level files'}")
+        repo.git.sparse_checkout("init", "--cone")
+        repo.git.sparse_checkout("set", *([project_root] if project_root else []))
+        # A --no-checkout clone has an empty index, so populate the sparse tree explicitly
+        repo.git.checkout()
+
+    def normalize_project_root(self, project_root: str) -> str:
+        root = (project_root or "").strip().replace("\\", "/").strip("/")
+        return "" if root in ("", ".") else root
+
+    @profiled_phase("get_repo_versions")
     def get_repo_versions(self, repo_path: str) -> Dict[str, Any]:
         print("\n📑 Analyzing repository versions")
+        cached = self.repo_analysis.get(repo_path, {}).get("versions")
+        if cached is not None:
+            print(f"♻️ Using cached versions ({len(cached['tags'])} semantic version tags)")
+            tags = [dict(tag, date=datetime.fromisoformat(tag['date'])) for tag in cached['tags']]
+            return {'tags': tags, 'latest_commit': cached['latest_commit']}
         repo = Repo(repo_path)
         versions = {
             'tags': [],
@@ -243,6 +602,11 @@ class InteractiveMigration:
             print("⚠️ No semantic version tags found in the repository")
         else:
             print(f"✅ Found {len(versions['tags'])} semantic version tags")
+        if repo_path in self.repo_analysis:
+            self.repo_analysis[repo_path]["versions"] = {
+                'tags': [dict(tag, date=tag['date'].isoformat()) for tag in versions['tags']],
+                'latest_commit': versions['latest_commit']
+            }
         return versions
 
     def format_version_tag(self, tag_name: str, index: int) -> str:
@@ -327,12 +691,18 @@ class InteractiveMigration:
         return formatted
 
     def get_default_branch(self, local_path: str) -> str:
+        analysis = self.repo_analysis.get(local_path, {})
+        if "default_branch" in analysis:
+            print(f"📌 Cached default branch: {analysis['default_branch']}")
+            return analysis["default_branch"]
         repo = Repo(local_path)
         try:
             default_branch = repo.active_branch.name
         except TypeError:
             default_branch = "main"
         print(f"📌 Detected default branch: {default_branch}")
+        if local_path in self.repo_analysis:
+            self.repo_analysis[local_path]["default_branch"] = default_branch
         return default_branch
 
     def configure_global_options(self):
@@ -375,6 +745,9 @@ class InteractiveMigration:
 
     def get_module_options(self, module_name: str) -> Dict[str, Any]:
         """Get module-specific options, with option to use global defaults"""
+        if module_name in self.module_options:
+            return self.module_options[module_name]
+        
         print(f"\n🔧 Configure Options for Module: {module_name}")
         print("Press Enter to use global defaults or provide custom values.")
         
@@ -385,6 +758,7 @@ class InteractiveMigration:
         customize = input("\nCustomize options for this module? (y/n) [n]: ").strip().lower() or "n"
         if customize != "y":
             print("Using global defaults for this module.")
+            self.module_options[module_name] = module_options
             return module_options
         
         # Workflow tool selection
@@ -431,8 +805,10 @@ class InteractiveMigration:
         for key, value in module_options.items():
             print(f"  - {key}: {value}")
         
+        self.module_options[module_name] = module_options
         return module_options
 
+    @profiled_phase("create_spacelift_module")
     def create_spacelift_module(self, module_name: str, local_path: str, space_id: str, integration_id: str):
         print(f"\n🚀 Creating Spacelift module: {module_name}")
         print(f"✅ Using space: {space_id}")
@@ -452,6 +828,14 @@ class InteractiveMigration:
         # Get the actual default branch
         default_branch = self.get_default_branch(local_path)
         
+        # Fill in description and provider labels from the Terraform interface index
+        index = self.get_terraform_index(local_path, self.normalize_project_root(module_options["projectRoot"]))
+        description = self.describe_module(module_name, index)
+        labels = list(module_options["labels"])
+        for provider in sorted(index['providers']) if index else []:
+            if f"provider:{provider}" not in labels:
+                labels.append(f"provider:{provider}")
+        
         # Use the exact mutation from the HAR file
         mutation = """
         mutation CreateModule($input: ModuleCreateInput!) {
@@ -466,8 +850,8 @@ class InteractiveMigration:
         variables = {
             "input": {
                 "name": safe_module_name,
-                "labels": module_options["labels"],
-                "description": f"Module imported from Azure DevOps: {module_name}",
+                "labels": labels,
+                "description": description,
                 "terraformProvider": module_options["terraformProvider"],
                 "branch": default_branch,
                 "namespace": self.azure_project,
@@ -482,8 +866,8 @@ class InteractiveMigration:
                     "administrative": module_options["administrative"],
                     "localPreviewEnabled": module_options["localPreviewEnabled"],
                     "branch": default_branch,
-                    "description": f"Module imported from Azure DevOps: {module_name}",
-                    "labels": module_options["labels"],
+                    "description": description,
+                    "labels": labels,
                     "name": safe_module_name,
                     "namespace": self.azure_project,
                     "projectRoot": module_options["projectRoot"],
@@ -515,6 +899,9 @@ class InteractiveMigration:
             if "errors" not in result:
                 print(f"✅ Module {module_name} successfully created")
                 self.log_migration(f"Created module: {module_name} in space: {space_id} with integration: {integration_id}")
+                module_id = (result.get("data", {}).get("moduleCreate") or {}).get("id") or f"terraform-default-{safe_module_name}"
+                self.record_journal("module_created", repo=module_name, module_id=module_id, space=space_id,
+                                    integration=integration_id, update_input=variables["input"]["updateInput"])
                 
                 # Get versions but ensure only one per commit and only semantic versions
                 versions = self.get_repo_versions(local_path)
@@ -544,23 +931,56 @@ class InteractiveMigration:
             else:
                 error_message = result.get('errors', [{}])[0].get('message', 'Unknown error')
                 print(f"Error creating module: {result['errors']}")
+                self.record_journal("module_failed", repo=module_name, space=space_id, error=error_message)
                 return False
         else:
             print(f"Error: API request failed with status code {response.status_code}")
+            self.record_journal("module_failed", repo=module_name, space=space_id, error=f"HTTP {response.status_code}")
             return False
 
-    def analyze_terraform_files(self, local_path: str) -> Dict[str, Any]:
+    @profiled_phase("analyze_terraform_files")
+    def analyze_terraform_files(self, local_path: str, project_root: str = "") -> Dict[str, Any]:
         print("\n🔍 Analyzing Terraform files...")
-        terraform_files = []
-        for root, _, files in os.walk(local_path):
-            for file in files:
-                if file.endswith('.tf'):
-                    terraform_files.append(os.path.join(root, file))
-        return {
+        # List tracked files from the clone's trees, so nothing has to be checked out
+        # to decide whether the project root contains Terraform
+        root = self.normalize_project_root(project_root)
+        prefix = f"{root}/" if root else ""
+        tracked = [path for path in Repo(local_path).git.ls_tree("-r", "--name-only", "HEAD").splitlines()
+                   if path.startswith(prefix)]
+        if root and not tracked:
+            print(f"⚠️ Project root not found in repository: {project_root}")
+        terraform_files = [os.path.join(local_path, path) for path in tracked if path.endswith('.tf')]
+        scan_path = os.path.join(local_path, root)
+        analysis = {
             'has_terraform': len(terraform_files) > 0,
             'file_count': len(terraform_files),
             'files': terraform_files
         }
+        if terraform_files:
+            self.checkout_project_root(local_path, root)
+            # The module interface is only the project root's own files, not
+            # examples/, nested modules or .terraform/
+            root_files = [path for path in terraform_files
+                          if os.path.normpath(os.path.dirname(path)) == os.path.normpath(scan_path)]
+            analysis['index'] = index_terraform_files(root_files)
+        return analysis
+
+    def get_terraform_index(self, local_path: str, project_root: str) -> Optional[Dict[str, Any]]:
+        """Return the Terraform interface index recorded by analyze_terraform_files (or the cache)"""
+        analysis = self.repo_analysis.get(local_path, {}).get("terraform", {}).get(project_root, {})
+        return analysis.get('index')
+
+    def describe_module(self, module_name: str, index: Optional[Dict[str, Any]]) -> str:
+        description = f"Module imported from Azure DevOps: {module_name}"
+        if not index:
+            return description
+        details = [f"{len(index['variables'])} variables ({len(index['required_variables'])} required)",
+                   f"{len(index['outputs'])} outputs"]
+        if index['providers']:
+            details.append(f"providers: {', '.join(sorted(index['providers']))}")
+        if index['required_version']:
+            details.append(f"requires {index['required_version']}")
+        return f"{description} ({'; '.join(details)})"
 
     def validate_source_integration(self) -> bool:
         return True
@@ -712,6 +1132,249 @@ class InteractiveMigration:
         except Exception as e:
             print(f"❌ Error fetching integrations: {e}")
 
+    def validate_space_and_integration(self, space_id: str, integration_id: str) -> List[str]:
+        """Check a space/integration pair against the spaces and integrations fetched during preflight"""
+        if not self.preflight_data:
+            return []
+        problems = []
+        spaces = {space["id"]: space for space in self.preflight_data.get("spaces") or []}
+        if space_id not in spaces:
+            problems.append(f"Space '{space_id}' does not exist or is not visible to this token")
+        elif spaces[space_id].get("accessLevel") not in ("ADMIN", "WRITE"):
+            problems.append(f"Token cannot write to space '{space_id}' (access level: {spaces[space_id].get('accessLevel')})")
+
+        integrations = {integration["id"]: integration for integration in self.preflight_data.get("vcsIntegrations") or []}
+        if integration_id not in integrations:
+            problems.append(f"VCS integration '{integration_id}' does not exist or is not visible to this token")
+        elif integrations[integration_id].get("provider") != "AZURE_DEVOPS":
+            problems.append(f"VCS integration '{integration_id}' is not an Azure DevOps integration")
+        return problems
+
+    def preflight_check(self, repos: List[dict], space_id: str, integration_id: str) -> (List[str], Dict[str, List[str]]):
+        """Validate the whole batch up front, before anything is cloned.
+
+        Returns batch-level problems and problems per repository name.
+        """
+        print(f"\n🛫 Running preflight checks for {len(repos)} repositories...")
+        batch_problems = []
+        repo_problems = {}
+        query = """
+        query Preflight {
+            viewer {
+                id
+                canCreateModules
+            }
+            modules {
+                id
+                name
+            }
+            spaces {
+                id
+                name
+                accessLevel
+            }
+            vcsIntegrations {
+                id
+                name
+                provider
+            }
+        }
+        """
+        data = {}
+        try:
+            result = self.graphql_post(query)
+            if "errors" in result:
+                batch_problems.append(f"Preflight query returned errors: {result['errors']}")
+            data = result.get("data") or {}
+        except Exception as e:
+            batch_problems.append(f"Preflight query failed: {e}")
+
+        if data:
+            # Same permission check as validate_spacelift_token, using the session token
+            if not (data.get("viewer") or {}).get("canCreateModules"):
+                batch_problems.append("Spacelift token cannot create modules")
+
+            # Kept for checking per-module space/integration selections later in the run
+            self.preflight_data = data
+            batch_problems.extend(self.validate_space_and_integration(space_id, integration_id))
+
+        existing_modules = set()
+        for module in data.get("modules") or []:
+            existing_modules.add(module.get("id"))
+            existing_modules.add(module.get("name"))
+
+        repos_by_module_name = {}
+        for repo in repos:
+            problems = []
+            safe_module_name = self.format_module_name(repo["name"])
+            if not safe_module_name:
+                problems.append("name is empty after formatting")
+            repos_by_module_name.setdefault(safe_module_name, []).append(repo["name"])
+            if safe_module_name in existing_modules or f"terraform-default-{safe_module_name}" in existing_modules:
+                problems.append(f"module '{safe_module_name}' already exists in Spacelift")
+            if repo.get("isDisabled"):
+                problems.append("repository is disabled")
+            elif not repo.get("defaultBranch"):
+                problems.append("repository has no default branch (empty repository?)")
+            if problems:
+                repo_problems[repo["name"]] = problems
+
+        for safe_module_name, repo_names in repos_by_module_name.items():
+            if len(repo_names) > 1:
+                for repo_name in repo_names:
+                    others = ", ".join(name for name in repo_names if name != repo_name)
+                    repo_problems.setdefault(repo_name, []).append(
+                        f"module name '{safe_module_name}' collides with: {others}")
+
+        if not batch_problems and not repo_problems:
+            print("✅ Preflight checks passed")
+            return batch_problems, repo_problems
+
+        print("\n❌ Preflight found the following problems:")
+        for problem in batch_problems:
+            print(f"- {problem}")
+            self.log_migration(f"Preflight: {problem}")
+        for repo_name, problems in repo_problems.items():
+            for problem in problems:
+                print(f"- {repo_name}: {problem}")
+                self.log_migration(f"Preflight: {repo_name}: {problem}")
+        return batch_problems, repo_problems
+
+    def load_created_modules(self, journal_paths: List[str], run_id: Optional[str] = None) -> List[dict]:
+        """Collect modules created in a run (latest run per journal by default) that are not yet deleted"""
+        journals = {}
+        for path in dict.fromkeys(journal_paths + [self.journal_file]):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                journals[path] = [json.loads(line) for line in f if line.strip()]
+
+        # Deletions may have been recorded in any of the journals, including this run's own
+        deleted = {entry["module_id"] for entries in journals.values() for entry in entries
+                   if entry["event"] == "module_deleted"}
+
+        created = []
+        for path in journal_paths:
+            entries = journals.get(path, [])
+            target_run = run_id or max((entry["run_id"] for entry in entries if entry["event"] == "module_created"), default=None)
+            for entry in entries:
+                if entry["event"] == "module_created" and entry["run_id"] == target_run and entry["module_id"] not in deleted:
+                    # Remember the source journal so the outcome is recorded next to the creation
+                    created.append(dict(entry, journal=path))
+        return created
+
+    def wait_for_rate_limit(self) -> None:
+        """Space out requests across all rollback workers"""
+        interval = 1.0 / self.rollback_requests_per_second
+        with self._rate_lock:
+            wait = self._last_request_at + interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request_at = time.monotonic()
+
+    def delete_module_batch(self, batch: List[dict]) -> Dict[str, Optional[str]]:
+        """Unprotect and delete a batch of modules in one GraphQL request.
+
+        Returns module id -> error message (None on success).
+        """
+        declarations = []
+        fields = []
+        variables = {}
+        for idx, entry in enumerate(batch):
+            declarations.append(f"$id{idx}: ID!")
+            variables[f"id{idx}"] = entry["module_id"]
+            update_input = entry.get("update_input") or {}
+            if update_input.get("protectFromDeletion", True):
+                # Mutation fields run in order, so protection is lifted before the delete
+                declarations.append(f"$input{idx}: ModuleUpdateInput!")
+                variables[f"input{idx}"] = dict(update_input, protectFromDeletion=False)
+                fields.append(f"unprotect{idx}: moduleUpdate(id: $id{idx}, input: $input{idx}) {{ id }}")
+            fields.append(f"delete{idx}: moduleDelete(id: $id{idx}) {{ id }}")
+        mutation = f"mutation RollbackModules({', '.join(declarations)}) {{\n" + "\n".join(fields) + "\n}"
+
+        last_error = None
+        for attempt in range(1, self.rollback_retries + 1):
+            self.wait_for_rate_limit()
+            try:
+                result = self.graphql_post(mutation, variables)
+                break
+            except Exception as e:
+                last_error = str(e)
+                if attempt < self.rollback_retries:
+                    time.sleep(2 ** attempt)
+        else:
+            return {entry["module_id"]: last_error for entry in batch}
+
+        data = result.get("data") or {}
+        errors_by_alias = {}
+        for error in result.get("errors", []):
+            alias = (error.get("path") or ["request"])[0]
+            errors_by_alias.setdefault(alias, error.get("message", "Unknown error"))
+
+        outcome = {}
+        for idx, entry in enumerate(batch):
+            if data.get(f"delete{idx}"):
+                outcome[entry["module_id"]] = None
+            else:
+                outcome[entry["module_id"]] = (errors_by_alias.get(f"unprotect{idx}")
+                                               or errors_by_alias.get(f"delete{idx}")
+                                               or errors_by_alias.get("request", "Module was not deleted"))
+        return outcome
+
+    def rollback(self, journal_paths: List[str], run_id: Optional[str] = None) -> bool:
+        """Delete every module a migration run created, as recorded in its journal"""
+        print("Welcome to the Azure DevOps to Spacelift Migration Tool!")
+        print("\n⏪ Rollback of a migration batch")
+        modules = self.load_created_modules(journal_paths, run_id)
+        if not modules:
+            print("No created modules found in the journal. Nothing to roll back.")
+            return True
+
+        run_ids = sorted({entry["run_id"] for entry in modules})
+        print(f"\nFound {len(modules)} modules created in run(s) {', '.join(run_ids)}:")
+        for entry in modules[:10]:
+            print(f"- {entry['module_id']} (space: {entry.get('space')})")
+        if len(modules) > 10:
+            print(f"  ... and {len(modules) - 10} more modules")
+
+        saved_config = self.load_config() or {}
+        self.spacelift_org = saved_config.get('spacelift_org') or input("Enter your Spacelift organization name: ").strip()
+        confirm = input(f"\nPermanently delete these {len(modules)} modules from {self.spacelift_org}? (y/n): ")
+        if confirm.lower() != 'y':
+            print("Rollback cancelled. Exiting...")
+            return False
+        if not self.get_spacectl_token():
+            print("Spacelift authentication failed. Exiting...")
+            return False
+
+        self.log_migration(f"Starting rollback of {len(modules)} modules")
+        batches = [modules[i:i + self.rollback_batch_size] for i in range(0, len(modules), self.rollback_batch_size)]
+        outcome = {}
+        with ThreadPoolExecutor(max_workers=self.rollback_workers) as executor:
+            for batch, batch_outcome in zip(batches, executor.map(self.delete_module_batch, batches)):
+                for entry in batch:
+                    error = batch_outcome[entry["module_id"]]
+                    outcome[entry["module_id"]] = error
+                    if error is None:
+                        print(f"✅ Deleted {entry['module_id']}")
+                        self.log_migration(f"Deleted module: {entry['module_id']}")
+                        self.record_journal("module_deleted", journal_file=entry["journal"],
+                                            repo=entry["repo"], module_id=entry["module_id"],
+                                            rolled_back_run=entry["run_id"])
+                    else:
+                        print(f"❌ Failed to delete {entry['module_id']}: {error}")
+                        self.log_migration(f"Failed to delete module {entry['module_id']}: {error}")
+                        self.record_journal("module_delete_failed", journal_file=entry["journal"],
+                                            repo=entry["repo"], module_id=entry["module_id"],
+                                            rolled_back_run=entry["run_id"], error=error)
+
+        failed = [module_id for module_id, error in outcome.items() if error is not None]
+        print(f"\n⏪ Rollback complete: {len(outcome) - len(failed)} deleted, {len(failed)} failed")
+        if failed:
+            print("Re-run the rollback to retry the failed modules.")
+        self.save_migration_log()
+        return not failed
+
     def purge_credentials(self) -> None:
         keyring.delete_password(self.service_id, self.username)
         try:
@@ -724,6 +1387,7 @@ class InteractiveMigration:
     def run(self) -> None:
         print("Welcome to the Azure DevOps to Spacelift Migration Tool!")
         self.log_migration("Starting migration process")
+        started_at = datetime.now()
         
         if not self.get_user_input():
             print("Configuration cancelled. Exiting...")
@@ -733,8 +1397,8 @@ class InteractiveMigration:
             print("Credential validation failed. Exiting...")
             return
 
-        repos = self.get_azure_repos()
-        selected_repos = self.select_repositories(repos)
+        repos = self.shard_repositories(self.get_azure_repos())
+        selected_repos = self.order_repositories(self.select_repositories(repos))
 
         proceed = input("\nWould you like to proceed with the migration? (y/n): ")
         if proceed.lower() != 'y':
@@ -762,6 +1426,23 @@ class InteractiveMigration:
         use_same = input("\nDo you want to use this space and integration for all modules? (y/n): ")
         use_same_for_all = use_same.lower() == 'y'
         
+        batch_problems, repo_problems = self.preflight_check(selected_repos, space_id, integration_id)
+        if batch_problems:
+            proceed = input("\nPreflight found batch-level problems. Continue anyway? (y/n): ")
+            if proceed.lower() != 'y':
+                print("Migration cancelled after preflight. Exiting...")
+                self.save_migration_log()
+                return
+        if repo_problems:
+            skip_failed = input(f"\nSkip the {len(repo_problems)} repositories that failed preflight? (y/n) [y]: ").strip().lower() or "y"
+            if skip_failed == 'y':
+                for repo in selected_repos:
+                    if repo["name"] in repo_problems:
+                        self.finish_repo(repo, "preflight_failed", time.perf_counter())
+                selected_repos = [repo for repo in selected_repos if repo["name"] not in repo_problems]
+                self.log_migration(f"Skipped {len(repo_problems)} repositories that failed preflight")
+                print(f"✅ Continuing with {len(selected_repos)} repositories")
+        
         os.makedirs(self.temp_dir, exist_ok=True)
 
         # Flag to track if we're in automatic mode
@@ -772,7 +1453,8 @@ class InteractiveMigration:
         for idx, repo in enumerate(selected_repos):
             repo_name = repo["name"]
             repo_url = repo["remoteUrl"]
-            local_path = os.path.join(self.temp_dir, repo_name)
+            local_path = self.get_clone_path(repo_name)
+            repo_started = time.perf_counter()
 
             if not auto_process:
                 # Add 'a' option for automatic processing of all remaining repos
@@ -789,13 +1471,33 @@ class InteractiveMigration:
                 elif proceed_repo != 'y':
                     print(f"Skipping {repo_name}")
                     self.log_migration(f"Skipped repository: {repo_name}")
+                    self.finish_repo(repo, "skipped", repo_started)
                     continue
             else:
                 print(f"\n🔄 Auto-processing repository: {repo_name} ({idx + 1}/{len(selected_repos)})")
 
-            self.clone_repo(repo_url, local_path, repo_name)
+            # Clone and analyse with the global project root; per-module options are
+            # only collected once a module is actually going to be created
+            project_root = self.normalize_project_root(self.global_options["projectRoot"])
             
-            tf_analysis = self.analyze_terraform_files(local_path)
+            # Unchanged refs (checked remotely) reuse the previous analysis and skip the clone
+            analysis = self.get_repo_analysis(repo, local_path, self.get_remote_ref_key(repo_name))
+            tf_analysis = analysis["terraform"].get(project_root)
+            cache_hit = tf_analysis is not None and (
+                not tf_analysis["has_terraform"]
+                or ("index" in tf_analysis and "versions" in analysis and "default_branch" in analysis))
+            if cache_hit:
+                print(f"\n♻️ Refs unchanged since {analysis['ref_key'][:8]}, using cached analysis for {repo_name}")
+                self.log_migration(f"Used cached analysis for {repo_name}")
+            else:
+                self.clone_repo(repo_url, local_path, repo_name)
+                tf_analysis = self.analyze_terraform_files(local_path, project_root)
+                analysis["terraform"][project_root] = tf_analysis
+                if tf_analysis["has_terraform"]:
+                    # Record branch and versions now, so the cache entry is complete even
+                    # when no module is created for this repository in this run
+                    self.get_default_branch(local_path)
+                    self.get_repo_versions(local_path)
             
             if tf_analysis['has_terraform']:
                 print(f"\nFound {tf_analysis['file_count']} Terraform files:")
@@ -822,13 +1524,37 @@ class InteractiveMigration:
                         if not current_space_id or not current_integration_id:
                             print(f"⚠️ Skipping module creation for {repo_name} due to missing space or integration")
                             self.log_migration(f"Skipped module creation for {repo_name} due to missing space or integration")
+                            self.finish_repo(repo, "skipped", repo_started)
                             continue
+                        
+                        selection_problems = self.validate_space_and_integration(current_space_id, current_integration_id)
+                        if selection_problems:
+                            for problem in selection_problems:
+                                print(f"❌ {problem}")
+                                self.log_migration(f"Preflight: {repo_name}: {problem}")
+                            proceed = input(f"Create module for {repo_name} anyway? (y/n): ")
+                            if proceed.lower() != 'y':
+                                self.finish_repo(repo, "preflight_failed", repo_started)
+                                continue
                     
-                    self.create_spacelift_module(repo_name, local_path, current_space_id, current_integration_id)
+                    module_options = self.get_module_options(repo_name)
+                    module_root = self.normalize_project_root(module_options["projectRoot"])
+                    if module_root != project_root and module_root not in analysis["terraform"]:
+                        # Per-module root differs from the global one: analysing it also
+                        # points the sparse checkout at that root
+                        if not os.path.isdir(local_path):
+                            self.clone_repo(repo_url, local_path, repo_name)
+                        analysis["terraform"][module_root] = self.analyze_terraform_files(local_path, module_root)
+                    
+                    created = self.create_spacelift_module(repo_name, local_path, current_space_id, current_integration_id)
+                    self.finish_repo(repo, "created" if created else "failed", repo_started)
                     time.sleep(2)
+                else:
+                    self.finish_repo(repo, "skipped", repo_started)
             else:
                 print(f"⚠️ No Terraform files found in {repo_name}, skipping...")
                 self.log_migration(f"No Terraform files found in {repo_name}")
+                self.finish_repo(repo, "no_terraform", repo_started)
 
         cleanup = input("\nWould you like to clean up temporary files? (y/n): ")
         if cleanup.lower() == 'y':
@@ -837,14 +1563,37 @@ class InteractiveMigration:
             print("✅ Cleanup complete")
             self.log_migration("Cleaned up temporary files")
 
+        self.save_metrics(started_at)
         self.save_migration_log()
         print("\n✨ Migration process completed!")
-        print("📝 Migration log saved to migration_log.txt")
+        print(f"📝 Migration log saved to {self.log_file}")
+        print(f"📝 Journal saved to {self.journal_file}, metrics to {self.metrics_file}")
 
         purge = input("\nWould you like to purge stored credentials? (y/n): ")
         if purge.lower() == 'y':
             self.purge_credentials()
 
 if __name__ == "__main__":
-    migration = InteractiveMigration()
-    migration.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Azure DevOps to Spacelift Module Migration Tool")
+    parser.add_argument("--profile-dir", help="Write per-phase cProfile (.pstats) and tracemalloc reports to this directory")
+    parser.add_argument("--schedule", choices=SCHEDULE_POLICIES, default="listing",
+                        help="Order in which repositories are processed (default: Azure DevOps listing order)")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Only process shard i of N (1-based), partitioned by a stable hash of the repository id")
+    parser.add_argument("--merge-shards", nargs="+", metavar="JOURNAL",
+                        help="Merge shard journals into migration_report.json and exit")
+    parser.add_argument("--rollback", nargs="+", metavar="JOURNAL",
+                        help="Delete the modules created by a run recorded in these journals and exit")
+    parser.add_argument("--run-id", help="Run to roll back (default: the latest run in each journal)")
+    args = parser.parse_args()
+
+    migration = InteractiveMigration(profile_dir=args.profile_dir, schedule_policy=args.schedule, shard=args.shard)
+    if args.merge_shards:
+        migration.merge_shard_journals(args.merge_shards)
+    elif args.rollback:
+        sys.exit(0 if migration.rollback(args.rollback, args.run_id) else 1)
+    else:
+        try:
+            migration.run()
+        finally:
+            migration.write_profiles()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import re
+from typing import List, Dict, Any
+
+TF_NAMED_BLOCK_RE = re.compile(r'^\s*(variable|output|provider)\s+"([^"]*)"\s*$')
+TF_TERRAFORM_BLOCK_RE = re.compile(r'^\s*terraform\s*$')
+TF_REQUIRED_PROVIDERS_RE = re.compile(r'^\s*required_providers\s*$')
+TF_ATTRIBUTE_RE = re.compile(r'^\s*"?([\w-]+)"?\s*=\s*(.*)$')
+TF_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"')
+TF_HEREDOC_RE = re.compile(r'<<-?(\w+)\s*$')
+TF_SEGMENT_RE = re.compile(r'([^{}]*)([{}]?)')
+
+# Characters with structural meaning are masked inside strings so that braces and
+# comment markers in string values do not affect block tracking
+STRING_MASK = str.maketrans({'{': '\x01', '}': '\x02', '#': '\x03', '/': '\x04'})
+STRING_UNMASK = str.maketrans({'\x01': '{', '\x02': '}', '\x03': '#', '\x04': '/'})
+
+
+def _mask_string(match: re.Match) -> str:
+    return match.group(0).translate(STRING_MASK)
+
+
+def _string_value(segment: str):
+    match = TF_STRING_RE.search(segment)
+    return match.group(0)[1:-1].translate(STRING_UNMASK) if match else None
+
+
+def index_terraform_files(files: List[str]) -> Dict[str, Any]:
+    """Single streaming pass over .tf files, extracting the module interface.
+
+    Collects variables (and whether they have a default), outputs, required
+    providers and required_version. Only the files passed in are read, so the
+    caller decides which directory makes up the module.
+    """
+    variables = {}
+    outputs = []
+    providers = {}
+    required_version = None
+
+    for path in files:
+        try:
+            f = open(path, 'r', encoding='utf-8', errors='replace')
+        except OSError:
+            continue
+        with f:
+            blocks = []  # (kind, name) for every open brace, innermost last
+            heredoc_end = None
+            in_comment = False
+            for line in f:
+                if heredoc_end:
+                    if line.strip() == heredoc_end:
+                        heredoc_end = None
+                    continue
+                code = TF_STRING_RE.sub(_mask_string, line)
+                if in_comment:
+                    if '*/' not in code:
+                        continue
+                    code = code.split('*/', 1)[1]
+                    in_comment = False
+                while '/*' in code:
+                    before, _, after = code.partition('/*')
+                    if '*/' not in after:
+                        code, in_comment = before, True
+                        break
+                    code = before + after.split('*/', 1)[1]
+                code = code.split('#', 1)[0].split('//', 1)[0]
+
+                # Walk the line brace by brace, so attributes on a block's opening
+                # line (e.g. `variable "x" { default = 1 }`) are seen inside the block
+                for segment, brace in TF_SEGMENT_RE.findall(code):
+                    if not segment.strip() and not brace:
+                        continue
+                    kind, name = blocks[-1] if blocks else (None, None)
+                    attribute = TF_ATTRIBUTE_RE.match(segment)
+                    opened = (None, None)
+
+                    if not blocks:
+                        block_match = TF_NAMED_BLOCK_RE.match(segment)
+                        if block_match and brace == '{':
+                            block_kind, block_name = block_match.groups()
+                            opened = (block_kind, block_name)
+                            if block_kind == "variable":
+                                variables.setdefault(block_name, {"required": True})
+                            elif block_kind == "output" and block_name not in outputs:
+                                outputs.append(block_name)
+                            elif block_kind == "provider":
+                                providers.setdefault(block_name, {})
+                        elif TF_TERRAFORM_BLOCK_RE.match(segment) and brace == '{':
+                            opened = ("terraform", None)
+                    elif kind == "variable" and attribute and attribute.group(1) == "default":
+                        variables[name]["required"] = False
+                    elif kind == "terraform":
+                        if TF_REQUIRED_PROVIDERS_RE.match(segment) and brace == '{':
+                            opened = ("required_providers", None)
+                        elif attribute and attribute.group(1) == "required_version":
+                            required_version = _string_value(segment) or required_version
+                    elif kind == "required_providers" and attribute:
+                        provider = providers.setdefault(attribute.group(1), {})
+                        if brace == '{' and not attribute.group(2).strip():
+                            opened = ("required_provider", attribute.group(1))
+                        elif _string_value(segment):
+                            provider["version"] = _string_value(segment)  # Legacy `name = "version"` syntax
+                    elif kind == "required_provider" and attribute and attribute.group(1) in ("source", "version"):
+                        value = _string_value(segment)
+                        if value:
+                            providers[name][attribute.group(1)] = value
+
+                    if brace == '{':
+                        blocks.append(opened)
+                    elif brace == '}' and blocks:
+                        blocks.pop()
+
+                # String literals are dropped first: a string ending in "<<EOF" is not a heredoc
+                heredoc = TF_HEREDOC_RE.search(TF_STRING_RE.sub('""', code))
+                if heredoc:
+                    heredoc_end = heredoc.group(1)
+
+    return {
+        "variables": sorted(variables),
+        "required_variables": sorted(name for name, info in variables.items() if info["required"]),
+        "outputs": outputs,
+        "providers": providers,
+        "required_version": required_version
+    }
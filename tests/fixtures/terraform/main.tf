@@ -0,0 +1,23 @@
+locals {
+  script = <<-EOT
+    variable "inside_heredoc" {
+      default = "x"
+    }
+  EOT
+}
+
+output "id" { value = azurerm_resource_group.this.id }
+
+output "name" {
+  value = var.name
+}
+
+provider "azurerm" {
+  features {}
+}
+
+output "rendered" {
+  value = <<EOT
+output "inside_output_heredoc" {}
+EOT
+}
@@ -0,0 +1,34 @@
+variable "name" {
+  type        = string
+  description = "Braces { and markers # // inside strings are ignored"
+}
+
+variable "location" { default = "westeurope" }
+
+variable "tags" {
+  type = map(string)
+  default = {
+    owner = "platform"
+  }
+}
+
+variable "settings" {
+  type = object({
+    default = string
+  })
+}
+
+/*
+variable "commented_out" {}
+*/
+
+# variable "also_commented" {}
+// variable "and_this" {}
+
+variable "template" {
+  description = "Pass a heredoc like <<EOF"
+}
+
+variable "after_template" {
+  default = null
+}
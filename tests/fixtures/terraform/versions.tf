@@ -0,0 +1,12 @@
+terraform { required_version = ">= 1.3.0" }
+
+terraform {
+  required_providers {
+    azurerm = {
+      source  = "hashicorp/azurerm" # pinned below
+      version = "~> 3.0"
+    }
+    random = "~> 3.1"
+    tls = { source = "hashicorp/tls" }
+  }
+}
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from git import Repo
+
+from Spacelift_Module_Migration import InteractiveMigration
+
+FILES = {
+    "README.md": "# network\n",
+    "main.tf": 'variable "name" {}\noutput "id" { value = 1 }\n',
+    "examples/basic/main.tf": 'variable "example_only" {}\nprovider "aws" {}\n',
+    "modules/vnet/main.tf": 'terraform { required_providers { azurerm = { source = "hashicorp/azurerm" } } }\n',
+    "docs/guide.md": "guide\n",
+}
+
+
+@pytest.fixture
+def migration(tmp_path):
+    origin = tmp_path / "origin"
+    for path, content in FILES.items():
+        os.makedirs(origin / os.path.dirname(path), exist_ok=True)
+        (origin / path).write_text(content)
+    repo = Repo.init(origin)
+    repo.index.add(list(FILES))
+    repo.index.commit("Initial commit")
+    repo.create_tag("v1.0.0")
+    repo.config_writer().set_value("uploadpack", "allowFilter", "true").release()
+
+    migration = InteractiveMigration()
+    migration.temp_dir = str(tmp_path / "temp_modules")
+    migration.get_auth_url = lambda repo_name: origin.as_uri()
+    return migration
+
+
+def checked_out(local_path):
+    return sorted(os.path.relpath(os.path.join(root, name), local_path).replace(os.sep, "/")
+                  for root, dirs, files in os.walk(local_path) if ".git" not in root.split(os.sep)
+                  for name in files)
+
+
+def test_clone_writes_nothing_until_terraform_is_found(migration):
+    local_path = migration.get_clone_path("network module")
+    migration.clone_repo("", local_path, "network module")
+    assert checked_out(local_path) == []
+
+    analysis = migration.analyze_terraform_files(local_path, "docs")
+    assert not analysis["has_terraform"]
+    assert checked_out(local_path) == []
+
+
+def test_root_analysis_indexes_only_root_files(migration):
+    local_path = migration.get_clone_path("network")
+    migration.clone_repo("", local_path, "network")
+
+    analysis = migration.analyze_terraform_files(local_path, "")
+    assert analysis["file_count"] == 3
+    # Cone mode without a directory checks out top-level files only
+    assert checked_out(local_path) == ["README.md", "main.tf"]
+    assert analysis["index"]["variables"] == ["name"]
+    assert analysis["index"]["providers"] == {}
+
+
+def test_module_root_narrows_the_checkout(migration):
+    local_path = migration.get_clone_path("network")
+    migration.clone_repo("", local_path, "network")
+
+    analysis = migration.analyze_terraform_files(local_path, "/modules/vnet/")
+    assert analysis["file_count"] == 1
+    assert checked_out(local_path) == ["README.md", "main.tf", "modules/vnet/main.tf"]
+    assert analysis["index"]["providers"] == {"azurerm": {"source": "hashicorp/azurerm"}}
+    assert migration.get_repo_versions(local_path)["tags"][0]["name"] == "v1.0.0"
@@ -0,0 +1,57 @@
+import pytest
+
+from Spacelift_Module_Migration import InteractiveMigration
+
+PREFLIGHT_DATA = {
+    "viewer": {"id": "me", "canCreateModules": True},
+    "modules": [{"id": "terraform-default-existing", "name": "existing"}],
+    "spaces": [
+        {"id": "writable", "name": "Writable", "accessLevel": "WRITE"},
+        {"id": "readonly", "name": "Read only", "accessLevel": "READ"},
+    ],
+    "vcsIntegrations": [
+        {"id": "ado", "name": "Azure DevOps", "provider": "AZURE_DEVOPS"},
+        {"id": "gh", "name": "GitHub", "provider": "GITHUB"},
+    ],
+}
+
+
+@pytest.fixture
+def migration():
+    migration = InteractiveMigration()
+    migration.graphql_post = lambda query, variables=None: {"data": PREFLIGHT_DATA}
+    return migration
+
+
+def repo(name, **fields):
+    return dict({"id": name, "name": name, "defaultBranch": "refs/heads/main"}, **fields)
+
+
+def test_clean_batch_passes(migration):
+    assert migration.preflight_check([repo("network")], "writable", "ado") == ([], {})
+
+
+def test_reports_every_problem_at_once(migration):
+    repos = [repo("existing"), repo("My Module"), repo("my-module"), repo("empty", defaultBranch=None),
+             repo("disabled", isDisabled=True)]
+    batch_problems, repo_problems = migration.preflight_check(repos, "readonly", "gh")
+
+    assert len(batch_problems) == 2
+    assert set(repo_problems) == {"existing", "My Module", "my-module", "empty", "disabled"}
+    assert "already exists" in repo_problems["existing"][0]
+    assert "collides with: my-module" in repo_problems["My Module"][0]
+
+
+def test_per_module_selection_uses_preflight_data(migration):
+    migration.preflight_check([repo("network")], "writable", "ado")
+    assert migration.validate_space_and_integration("writable", "ado") == []
+    problems = migration.validate_space_and_integration("readonly", "missing")
+    assert len(problems) == 2
+
+
+def test_failed_preflight_query_is_a_batch_problem(migration):
+    def failing_post(query, variables=None):
+        raise Exception("GraphQL request failed with status 502")
+    migration.graphql_post = failing_post
+    batch_problems, _ = migration.preflight_check([repo("network")], "writable", "ado")
+    assert batch_problems == ["Preflight query failed: GraphQL request failed with status 502"]
@@ -0,0 +1,32 @@
+import os
+
+from Spacelift_Module_Migration import InteractiveMigration, profiled_phase
+
+
+class ProfiledMigration(InteractiveMigration):
+    @profiled_phase("outer")
+    def outer(self, value):
+        return self.inner(value) + 1
+
+    @profiled_phase("inner")
+    def inner(self, value):
+        return [value] * 1000 and value
+
+
+def test_disabled_profiling_writes_nothing(tmp_path):
+    migration = ProfiledMigration()
+    assert migration.outer(1) == 2
+    migration.write_profiles()
+    assert migration.phase_profiles == {}
+
+
+def test_one_profile_per_phase(tmp_path):
+    migration = ProfiledMigration(profile_dir=str(tmp_path))
+    for value in range(5):
+        assert migration.outer(value) == value + 1
+    migration.write_profiles()
+
+    # Nested phases are part of the outer profile, calls are combined per phase
+    assert sorted(os.listdir(tmp_path)) == ["outer.alloc.txt", "outer.pstats"]
+    with open(tmp_path / "outer.alloc.txt") as f:
+        assert "Calls: 5" in f.read()
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from Spacelift_Module_Migration import InteractiveMigration
+
+
+@pytest.fixture
+def migration(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    migration = InteractiveMigration()
+    migration.rollback_requests_per_second = 1000
+    return migration
+
+
+def created(module_id, protected=True, run_id="R1"):
+    return {"run_id": run_id, "event": "module_created", "repo": module_id, "module_id": module_id,
+            "update_input": {"name": module_id, "protectFromDeletion": protected}}
+
+
+def write_journal(path, entries):
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(dict({"timestamp": "2026-10-19T10:00:00", "shard": None}, **entry)) + "\n")
+
+
+def test_batch_unprotects_only_protected_modules(migration):
+    requests = []
+
+    def post(query, variables=None):
+        requests.append((query, variables))
+        return {"data": {"unprotect0": {"id": "a"}, "delete0": {"id": "a"}, "delete1": {"id": "b"}}}
+
+    migration.graphql_post = post
+    outcome = migration.delete_module_batch([dict(created("a"), journal="j"), dict(created("b", protected=False), journal="j")])
+
+    assert outcome == {"a": None, "b": None}
+    query, variables = requests[0]
+    assert "unprotect0: moduleUpdate(id: $id0, input: $input0)" in query
+    assert "unprotect1" not in query
+    # Protection is lifted before the delete of the same module
+    assert query.index("unprotect0") < query.index("delete0")
+    assert variables["input0"] == {"name": "a", "protectFromDeletion": False}
+    assert "input1" not in variables
+
+
+def test_errors_map_to_their_module(migration):
+    migration.graphql_post = lambda query, variables=None: {
+        "data": {"unprotect0": None, "delete0": None, "delete1": {"id": "b"}, "delete2": None},
+        "errors": [
+            {"path": ["unprotect0"], "message": "not allowed"},
+            {"path": ["delete0"], "message": "module is protected"},
+            {"message": "partial failure"},
+        ],
+    }
+    batch = [created("a"), created("b", protected=False), created("c", protected=False)]
+    outcome = migration.delete_module_batch(batch)
+
+    assert outcome == {"a": "not allowed", "b": None, "c": "partial failure"}
+
+
+def test_failed_request_retries_without_trailing_sleep(migration, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("Spacelift_Module_Migration.time.sleep", sleeps.append)
+    migration.wait_for_rate_limit = lambda: None
+
+    def post(query, variables=None):
+        raise Exception("GraphQL request failed with status 503")
+
+    migration.graphql_post = post
+    outcome = migration.delete_module_batch([created("a")])
+
+    assert outcome == {"a": "GraphQL request failed with status 503"}
+    assert sleeps == [2, 4]
+
+
+def test_rerun_skips_deleted_modules(migration, monkeypatch):
+    write_journal("migration_journal.shard-1-of-2.jsonl", [created("old", run_id="R0"), created("a"), created("b")])
+    monkeypatch.setattr("builtins.input", lambda prompt: "y")
+    migration.load_config = lambda: {"spacelift_org": "example"}
+    migration.get_spacectl_token = lambda: True
+    deleted_ids = []
+
+    def post(query, variables=None):
+        ids = [value for key, value in variables.items() if key.startswith("id")]
+        deleted_ids.extend(ids)
+        return {"data": {f"delete{idx}": {"id": module_id} for idx, module_id in enumerate(ids)}}
+
+    migration.graphql_post = post
+    assert migration.rollback(["migration_journal.shard-1-of-2.jsonl"])
+    # Only the latest run is rolled back
+    assert sorted(deleted_ids) == ["a", "b"]
+
+    rerun = InteractiveMigration()
+    rerun.load_config, rerun.get_spacectl_token, rerun.graphql_post = migration.load_config, migration.get_spacectl_token, post
+    assert rerun.load_created_modules(["migration_journal.shard-1-of-2.jsonl"]) == []
+    assert rerun.rollback(["migration_journal.shard-1-of-2.jsonl"])
+    assert sorted(deleted_ids) == ["a", "b"]
@@ -0,0 +1,47 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from Spacelift_Module_Migration import InteractiveMigration
+
+
+@pytest.fixture
+def migration(tmp_path):
+    migration = InteractiveMigration()
+    migration.analysis_cache_file = str(tmp_path / "analysis_cache.json")
+    return migration
+
+
+def repos(*sizes):
+    return [{"id": f"id{idx}", "name": f"repo{idx}", "size": size} for idx, size in enumerate(sizes)]
+
+
+def names(ordered):
+    return [repo["name"] for repo in ordered]
+
+
+def test_listing_keeps_order(migration):
+    assert names(migration.order_repositories(repos(1, 3, 2))) == ["repo0", "repo1", "repo2"]
+
+
+def test_largest_and_smallest_first(migration):
+    migration.schedule_policy = "largest-first"
+    assert names(migration.order_repositories(repos(1, 3, 2))) == ["repo1", "repo2", "repo0"]
+    migration.schedule_policy = "smallest-first"
+    assert names(migration.order_repositories(repos(1, 3, 2))) == ["repo0", "repo2", "repo1"]
+
+
+def test_tag_counts_from_analysis_cache(migration):
+    entry = {"stored_at": datetime.now().isoformat(), "versions": {"tags": [{}] * 3, "latest_commit": "abc"}}
+    with open(migration.analysis_cache_file, "w") as f:
+        json.dump({"id0": entry}, f)
+    migration.schedule_policy = "largest-first"
+    # Three versions outweigh a few KiB of repository size
+    assert names(migration.order_repositories(repos(10, 5000))) == ["repo0", "repo1"]
+
+
+def test_round_robin_interleaves_size_buckets(migration):
+    migration.schedule_policy = "round-robin"
+    ordered = migration.order_repositories(repos(*range(8)))
+    assert names(ordered) == ["repo7", "repo5", "repo3", "repo1", "repo6", "repo4", "repo2", "repo0"]
@@ -0,0 +1,60 @@
+import argparse
+import json
+
+import pytest
+
+from Spacelift_Module_Migration import InteractiveMigration, parse_shard
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    assert parse_shard(" 4/4 ") == (4, 4)
+    for value in ("0/4", "5/4", "1/0", "1-4", "a/b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+
+def test_shards_are_disjoint_complete_and_stable():
+    repos = [{"id": f"3f2a-{idx:04d}", "name": f"repo{idx}"} for idx in range(200)]
+    shards = [InteractiveMigration(shard=(index, 4)).shard_repositories(repos) for index in range(1, 5)]
+
+    ids = [repo["id"] for shard in shards for repo in shard]
+    assert sorted(ids) == sorted(repo["id"] for repo in repos)
+    assert len(ids) == len(set(ids))
+    assert all(shard for shard in shards)
+    # Same assignment regardless of listing order
+    reordered = InteractiveMigration(shard=(2, 4)).shard_repositories(list(reversed(repos)))
+    assert sorted(repo["id"] for repo in reordered) == sorted(repo["id"] for repo in shards[1])
+
+
+def write_journal(path, entries):
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(dict({"timestamp": "2026-10-19T10:00:00", "shard": None}, **entry)) + "\n")
+
+
+def test_merge_uses_latest_run_and_skips_rolled_back_modules(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_journal("shard-1.jsonl", [
+        # An earlier run of shard 1, superseded by the run below
+        {"run_id": "R0", "shard": "1/2", "event": "repo", "repo": "a", "repo_id": "a", "status": "failed", "seconds": 100},
+        {"run_id": "R1", "shard": "1/2", "event": "module_created", "repo": "a", "module_id": "terraform-default-a"},
+        {"run_id": "R1", "shard": "1/2", "event": "repo", "repo": "a", "repo_id": "a", "status": "created", "seconds": 2},
+        {"run_id": "R1", "shard": "1/2", "event": "module_created", "repo": "b", "module_id": "terraform-default-b"},
+        {"run_id": "R1", "shard": "1/2", "event": "repo", "repo": "b", "repo_id": "b", "status": "created", "seconds": 3},
+        {"run_id": "R9", "event": "module_deleted", "repo": "b", "module_id": "terraform-default-b"},
+    ])
+    write_journal("shard-2.jsonl", [
+        {"run_id": "R2", "shard": "2/2", "event": "repo", "repo": "c", "repo_id": "c", "status": "no_terraform", "seconds": 1},
+    ])
+
+    report = InteractiveMigration().merge_shard_journals(["shard-1.jsonl", "shard-2.jsonl"])
+
+    assert sorted(report["shards"]) == ["1/2", "2/2"]
+    assert report["repositories"] == 3
+    assert report["status_counts"] == {"created": 2, "no_terraform": 1}
+    assert [module["module_id"] for module in report["modules_created"]] == ["terraform-default-a"]
+    assert report["repo_seconds_total"] == 6
+    assert report["overlapping_repositories"] == []
+    with open("migration_report.json") as f:
+        assert json.load(f) == report
@@ -0,0 +1,52 @@
+import glob
+import os
+
+import pytest
+
+from terraform_index import index_terraform_files
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "terraform")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return index_terraform_files(sorted(glob.glob(os.path.join(FIXTURES, "*.tf"))))
+
+
+def test_variables_skip_comments_and_heredocs(index):
+    assert index["variables"] == ["after_template", "location", "name", "settings", "tags", "template"]
+
+
+def test_default_marks_variable_optional(index):
+    # Single-line and multi-line defaults count; a nested `default` attribute
+    # inside the type expression does not
+    assert index["required_variables"] == ["name", "settings", "template"]
+
+
+def test_heredoc_marker_inside_string_is_not_a_heredoc(tmp_path):
+    path = tmp_path / "main.tf"
+    path.write_text('variable "x" {\n  description = "Pass a heredoc like <<EOF"\n}\n'
+                    'variable "after" {}\noutput "o" { value = 1 }\n')
+    index = index_terraform_files([str(path)])
+    assert index["variables"] == ["after", "x"]
+    assert index["outputs"] == ["o"]
+
+
+def test_outputs(index):
+    assert index["outputs"] == ["id", "name", "rendered"]
+
+
+def test_required_version_from_single_line_block(index):
+    assert index["required_version"] == ">= 1.3.0"
+
+
+def test_required_providers(index):
+    assert index["providers"] == {
+        "azurerm": {"source": "hashicorp/azurerm", "version": "~> 3.0"},
+        "random": {"version": "~> 3.1"},
+        "tls": {"source": "hashicorp/tls"},
+    }
+
+
+def test_unreadable_file_is_skipped(tmp_path):
+    assert index_terraform_files([str(tmp_path / "missing.tf")])["variables"] == []